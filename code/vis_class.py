@@ -18,7 +18,6 @@ from bokeh.layouts import column,row
 from bokeh.models.widgets import RadioButtonGroup
 from bkcharts.attributes import cat,color
 from bkcharts.operations import blend
-import networkx as nx
 
 from notebook_import import *
 from python_ehub import data,model
@@ -42,6 +41,7 @@ class VizTool:
         self.time_steps = max_time
         self.week_h = 168
         self.time_weeks = self.time_steps // self.week_h
+        self.P = self.to_array(model.P.get_values(),(self.n_hubs+1,self.time_steps+1,self.n_techs+1))
         
         self.nodes = []
         for hubs in range(1,self.n_hubs+1):
@@ -57,17 +57,13 @@ class VizTool:
                
               
     def demand_plot(self):
+        demand = self.to_array(self.demand,(self.n_hubs+1,self.time_steps+1,self.n_forms+1))
         data_dict = {}
         for forms in range(1,self.n_forms+1):
-            data_dict['node_data_' + str(forms)] = np.zeros((self.time_steps+1,self.n_hubs+1))
+            data_dict['node_data_' + str(forms)] = np.ascontiguousarray(demand[:,:,forms].T) #hours x hubs
             
-        data_dict['time_step'] = np.linspace(1,self.time_steps+1,self.time_steps+1)
+        data_dict['time_step'] = np.arange(1,self.time_steps+2,dtype=float)
         
-        for hub_step in range(1,self.n_hubs+1):
-            for time_step in range(1,self.time_steps+1):
-                for forms in range(1,self.n_forms+1):
-                    (data_dict['node_data_' + str(forms)])[time_step][hub_step] = self.demand[hub_step,time_step,forms]
-                    
         for forms in range(1,self.n_forms+1):
             for hub_step in range(1,self.n_hubs+1):
                 data_dict['n' + str(hub_step) + str(forms)] = data_dict['node_data_' + str(forms)][1:,hub_step]
@@ -113,24 +109,21 @@ class VizTool:
     
     def production(self):
 
-        prodmat = {}
-    
-        for hub_step in range(1,self.n_hubs+1):
-            for time_step in range(1,self.time_steps+1):
-                for forms in range(1,self.n_forms+1):
-                    for techs in range(1,self.n_techs+1):
-                        prodmat[(hub_step,time_step,forms,techs)] = self.demand[(hub_step,time_step,forms)]*self.cmatrix[(techs,forms)]
-    
+        demand = self.demand
+        cmatrix = self.cmatrix
+        time_range = range(1,self.time_steps+1)
         prod_data = {}
     
         for hub_step in range(1,self.n_hubs+1):
             for forms in range(1,self.n_forms+1):
                 for techs in range(1,self.n_techs+1):
-                    prod_data['n' + str(hub_step) + str(forms) + str(techs)] = np.zeros((self.time_steps+1))
-                    for time_step in range(1,self.time_steps+1):
-                        prod_data['n' + str(hub_step) + str(forms) + str(techs)][time_step] = prodmat[(hub_step,time_step,forms,techs)]
+                    factor = cmatrix[(techs,forms)]
+                    prod = np.zeros((self.time_steps+1))
+                    for time_step in time_range:
+                        prod[time_step] = demand[(hub_step,time_step,forms)]*factor
+                    prod_data['n' + str(hub_step) + str(forms) + str(techs)] = prod
     
-        prod_data['time_step'] = np.linspace(1,self.time_steps+1,self.time_steps+1)
+        prod_data['time_step'] = np.arange(1,self.time_steps+2,dtype=float)
         
         cols = []
         for techs in range(1,self.n_techs+1):
@@ -161,16 +154,7 @@ class VizTool:
         
         tech_legend1 = self.create_legend()
     
-        prod_dataw = {}
-        if(self.time_weeks == 0):
-            for k,v in prod_data.items():
-                prod_dataw[k] = np.zeros((1))
-            prod_dataw['time_step'] = np.zeros((1))
-        else:
-            for k,v in prod_data.items():
-                v = v[:self.time_weeks * self.week_h]
-                prod_dataw[k] = np.sum(v.reshape(-1, self.week_h), axis=1)
-            prod_dataw['time_step'] = np.linspace(1,self.time_weeks,self.time_weeks)
+        prod_dataw = self.weekly_sums(prod_data)
     
         bar_w = Bar(prod_dataw,
                   values=blend(*cols, name='medals', labels_name='medal'),
@@ -236,7 +220,6 @@ class VizTool:
     
             for techs in range(1,self.n_techs+1):
                 cols.append('n' + str(node) + str(form) + str(techs))
-                print ('n' + str(node) + str(form) + str(techs))
     
     
             pbarw = Bar(prod_dataw,
@@ -290,12 +273,11 @@ class VizTool:
     def capacities(self):
     
         cap_source = {}
+        capacities = self.to_array(self.cap_dict,(self.n_hubs+1,self.n_techs+1,self.n_forms+1))
         
         for techs in range(1,self.n_techs+1):
             for forms in range(1,self.n_forms+1):
-                cap_source['n' + str(techs) + str(forms)] = np.zeros((self.n_hubs))
-                for hub_step in range(1,self.n_hubs+1):
-                    cap_source['n' + str(techs) + str(forms)][hub_step-1] = self.cap_dict[(hub_step,techs,forms)]
+                cap_source['n' + str(techs) + str(forms)] = np.ascontiguousarray(capacities[1:,techs,forms])
                 #cap_source['n' + str(techs) + str(forms)] = np.array(cap_source['n' + str(techs) + str(forms)])
         
 #        for forms in range(1,self.n_forms+1):
@@ -373,15 +355,12 @@ class VizTool:
         
         tech_legend1 = self.create_legend() 
         
-        storage = model.StorageCap.get_values()
-        print (storage)
+        storage = self.to_array(model.StorageCap.get_values(),(self.n_hubs+1,self.n_forms+1))
         storage_dict = {}
         storage_dict['n_list'] = self.nodes
            
         for forms in range(1,self.n_forms+1):
-            storage_dict['f' + str(forms)] = np.zeros((self.n_hubs))
-            for hub_step in range(1,self.n_hubs+1):
-                storage_dict['f' + str(forms)][hub_step-1] = storage[(hub_step,forms)]
+            storage_dict['f' + str(forms)] = np.ascontiguousarray(storage[1:,forms])
         
 #        storage_dict['f1'] = [23,67,98,41,11]
         
@@ -497,16 +476,12 @@ class VizTool:
           
     def networks(self):
         
-        transfer_source = model.DH_Q.get_values()
-        demand = data.Demands()
-        n_hubs = data.numberofhubs
-        n_forms = data.numberofdemands
+        import networkx as nx #only needed for multi-hub cases, so it is not imported at module load
         
-        max_time = 0
-        for key in demand:
-            if(key[1] > max_time):
-                max_time = key[1]
-        time_steps = max_time
+        transfer_source = model.DH_Q.get_values()
+        n_hubs = self.n_hubs
+        n_forms = self.n_forms
+        time_steps = self.time_steps
         
         t_dict = {}            
         for forms in range(1,n_forms+1):
@@ -535,12 +510,7 @@ class VizTool:
         trans_dict_1 = {}
         trans_dict_1['x'] = x_coord_1
         trans_dict_1['y'] = y_coord_1
-        
-        nodes = []
-        for hubs in range(1,n_hubs+1):
-            nodes.append("Node" + str(hubs))
-            
-        trans_dict_1['node_list'] = nodes
+        trans_dict_1['node_list'] = self.nodes
         
         for forms in range(1,n_forms+1):
             trans_dict_1['xf' + str(forms)] = []
@@ -580,17 +550,13 @@ class VizTool:
             line_dict_1_cds.data['xdummy'] = line_dict_1_cds.data['xf' + str(form)]
             line_dict_1_cds.data['ydummy'] = line_dict_1_cds.data['yf' + str(form)]
             
-        e_forms = []
-        for forms in range(1,n_forms+1):
-            e_forms.append("Form" + str(forms))
-        
-        form_select_network = Select(value="Form1", title='Forms', options=e_forms)    
+        form_select_network = Select(value="Form1", title='Forms', options=self.e_forms)    
         form_select_network.on_change('value', update_plot_networks)
         
         transfer_plot_1.add_layout(color_bar, 'right')
         
         G = nx.DiGraph()
-        G.add_nodes_from(np.linspace(1,n_hubs,n_hubs))
+        G.add_nodes_from(range(1,n_hubs+1))
         
         edges = {}
         
@@ -627,11 +593,7 @@ class VizTool:
         for k,v in y_coords.items():
             trans_dict["yc" + k] = v
         
-        nodes = []
-        for hubs in range(1,n_hubs+1):
-            nodes.append("Node" + str(hubs))
-            
-        trans_dict['node_list'] = nodes
+        trans_dict['node_list'] = self.nodes
         
         for forms in range(1,n_forms+1):
             trans_dict['xf' + str(forms)] = []
@@ -676,11 +638,7 @@ class VizTool:
             line_dict_cds.data['ycdummy'] = line_dict_cds.data['ycf' + str(form)]
         
         
-        e_forms = []
-        for forms in range(1,n_forms+1):
-            e_forms.append("Form" + str(forms))
-        
-        form_select_st = Select(value="Form1", title='Forms', options=e_forms)    
+        form_select_st = Select(value="Form1", title='Forms', options=self.e_forms)    
         form_select_st.on_change('value', update_plot_force)
         
         transfer_plot.add_layout(color_bar, 'right')
@@ -693,17 +651,12 @@ class VizTool:
     def costs(self):
     
         op_cost = model.OpCost.get_values()[None]
-        opcost_dict = {}
-        opcost_dict.update((x, y*op_cost) for x, y in model.P.get_values().items())
         opcost_data = {}
         
         for techs in range(1,self.n_techs+1):
-            opcost_data['t' + str(techs)] = np.zeros((self.time_steps))
-            for time_step in range(1,self.time_steps):
-                for hub_step in range(1,self.n_hubs+1):
-                    opcost_data['t' + str(techs)][time_step] += opcost_dict[(hub_step,time_step,techs)]
+            opcost_data['t' + str(techs)] = self.P[1:,:self.time_steps,techs].sum(axis=0)*op_cost
                     
-        opcost_data['time_step'] = np.linspace(1,self.time_steps,self.time_steps)
+        opcost_data['time_step'] = np.arange(1,self.time_steps+1,dtype=float)
         
         cols = []
         for techs in range(1,self.n_techs+1):
@@ -734,17 +687,7 @@ class VizTool:
         
         tech_legend1 = self.create_legend()
         
-        opcost_dataw = {}
-        if(self.time_weeks == 0):
-            for k,v in opcost_data.items():
-                opcost_dataw[k] = np.zeros((1))
-            opcost_dataw['time_step'] = np.zeros((1))
-        else:
-            for k,v in opcost_data.items():
-                v = v[:self.time_weeks * self.week_h]
-                print (v[:self.time_weeks * self.week_h])
-                opcost_dataw[k] = np.sum(v.reshape(-1, self.week_h), axis=1)
-            opcost_dataw['time_step'] = np.linspace(1,self.time_weeks,self.time_weeks)
+        opcost_dataw = self.weekly_sums(opcost_data)
         
         opcostbar_w = Bar(opcost_dataw,
                   values=blend(*cols, name='medals', labels_name='medal'),
@@ -767,23 +710,13 @@ class VizTool:
             ]
         )
         
-        mtc_cost = data.VarMaintCost()
-        
-        P = model.P.get_values()
-        
-        for hub_step in range(1,self.n_hubs+1):
-            for techs in range(1,self.n_techs+1):
-                for time_step in range(1,self.time_steps):
-                    P[(hub_step,time_step,techs)] *= mtc_cost[(hub_step,techs)]
+        mtc_cost = self.to_array(data.VarMaintCost(),(self.n_hubs+1,self.n_techs+1))
         
         mtccost_data = {}        
         for techs in range(1,self.n_techs+1):
-            mtccost_data['t' + str(techs)] = np.zeros((self.time_steps))
-            for time_step in range(1,self.time_steps):
-                for hub_step in range(1,self.n_hubs+1):
-                    mtccost_data['t' + str(techs)][time_step] += P[(hub_step,time_step,techs)]
+            mtccost_data['t' + str(techs)] = (self.P[1:,:self.time_steps,techs]*mtc_cost[1:,techs,np.newaxis]).sum(axis=0)
         
-        mtccost_data['time_step'] = np.linspace(1,self.time_steps,self.time_steps)
+        mtccost_data['time_step'] = np.arange(1,self.time_steps+1,dtype=float)
         
         mtccost_bar = Bar(mtccost_data,
                   values=blend(*cols, name='medals', labels_name='medal'),
@@ -859,12 +792,17 @@ class VizTool:
     
     def carbon_emissions(self):
         
+        carbon_factors = self.to_array(model.carbonFactors.extract_values(),(self.n_techs+1,))
+        hourly_P = self.P[:,:self.time_steps,:]
+        carbon_techs = hourly_P[1:].sum(axis=0)
+        carbon_techs *= carbon_factors #scaled in place, no hubs x hours x techs temporary
+        carbon_techs = np.ascontiguousarray(carbon_techs.T) #techs x hours
+        carbon_nodes = hourly_P.dot(carbon_factors) #hubs x hours
+        
         c_em_tech = {} 
-        c_em_tech['time_step'] = np.linspace(1,self.time_steps,self.time_steps)
+        c_em_tech['time_step'] = np.arange(1,self.time_steps+1,dtype=float)
         for techs in range(1,self.n_techs+1):
-            c_em_tech['t' + str(techs)] = np.zeros((self.time_steps))
-            for time_step in range(1,self.time_steps):
-                c_em_tech['t' + str(techs)][time_step] = value(model.carbonFactors[techs] * sum(model.P[i, time_step,techs] for i in model.hub_i))
+            c_em_tech['t' + str(techs)] = carbon_techs[techs]
         
         cols = []
         for techs in range(1,self.n_techs+1):
@@ -895,16 +833,7 @@ class VizTool:
         
         tech_legend1 = self.create_legend()
         
-        c_em_techw = {}
-        if(self.time_weeks == 0):
-            for k,v in c_em_tech.items():
-                c_em_techw[k] = np.zeros((1))
-            c_em_techw['time_step'] = np.zeros((1))
-        else:
-            for k,v in c_em_tech.items():
-                v = v[:self.time_weeks * self.week_h]
-                c_em_techw[k] = np.sum(v.reshape(-1, self.week_h), axis=1)
-            c_em_techw['time_step'] = np.linspace(1,self.time_weeks,self.time_weeks)
+        c_em_techw = self.weekly_sums(c_em_tech)
         
         bar_w = Bar(c_em_techw,
                   values=blend(*cols, name='medals', labels_name='medal'),
@@ -928,12 +857,10 @@ class VizTool:
         )
         
         c_em_nodes = {} 
-        c_em_nodes['time_step'] = np.linspace(1,self.time_steps,self.time_steps)
+        c_em_nodes['time_step'] = np.arange(1,self.time_steps+1,dtype=float)
         
         for hub_step in range(1,self.n_hubs+1):    
-            c_em_nodes['n' + str(hub_step)] = np.zeros((self.time_steps))
-            for time_step in range(1,self.time_steps):
-                c_em_nodes['n' + str(hub_step)][time_step] = value(sum(model.carbonFactors[inp] * model.P[hub_step, time_step,inp] for inp in model.In))
+            c_em_nodes['n' + str(hub_step)] = carbon_nodes[hub_step]
         
         col_nodes = []
         for hubs in range(1,self.n_hubs+1):
@@ -982,15 +909,12 @@ class VizTool:
         return column(bar,tech_legend1,bar_w,n_bar,node_legend)
     
     def exports(self):
-        export = model.Pexport.get_values()
+        export = self.to_array(model.Pexport.get_values(),(self.n_hubs+1,self.time_steps+1,self.n_forms+1))
         exp_dict = {}
         
         for forms in range(1,self.n_forms+1):
-            exp_dict['f' + str(forms)] = np.zeros((self.time_steps+1))
-            for time_step in range(1,self.time_steps+1):
-                for hub_step in range(1,self.n_hubs+1):
-                    exp_dict['f' + str(forms)][time_step] += export[(hub_step,time_step,forms)]
-        exp_dict['time_step'] = np.linspace(1,self.time_steps,self.time_steps)
+            exp_dict['f' + str(forms)] = export[1:,:,forms].sum(axis=0)
+        exp_dict['time_step'] = np.arange(1,self.time_steps+1,dtype=float)
         exp_source = ColumnDataSource(data=exp_dict)
         color = brewer['Set1'][self.n_forms]
         
@@ -1005,6 +929,26 @@ class VizTool:
                 
         return column(export_plot_1)
     
+    def weekly_sums(self, hourly):
+        weekly = {}
+        if(self.time_weeks == 0):
+            for k in hourly:
+                weekly[k] = np.zeros((1))
+            weekly['time_step'] = np.zeros((1))
+        else:
+            week_hours = self.time_weeks * self.week_h
+            for k,v in hourly.items():
+                weekly[k] = np.sum(v[:week_hours].reshape(-1, self.week_h), axis=1)
+            weekly['time_step'] = np.arange(1,self.time_weeks+1,dtype=float)
+        return weekly
+    
+    def to_array(self, values, shape):
+        #dense array from a Pyomo formatted dict, Pyomo indices start at 1 so index 0 stays empty
+        array = np.zeros(shape)
+        for key, val in values.items():
+            array[key] = val
+        return array
+    
     def create_legend(self):
             y = [0] * len(self.e_techs)
             x = self.e_techs